@@ -0,0 +1,64 @@
+"""Compares request latency of an erroring endpoint with synchronous
+logging versus `enable_async_logging`, using a deliberately slow handler.
+
+    $ python -m benchmarks.bench_logging
+"""
+import time
+import logging
+
+from flask import Flask
+
+from flask_yoloapi import endpoint
+from flask_yoloapi.log import enable_async_logging
+
+REQUESTS = 200
+HANDLER_DELAY = 0.002  # e.g. a slow disk or remote syslog
+
+
+class SlowHandler(logging.Handler):
+    def emit(self, record):
+        self.format(record)
+        time.sleep(HANDLER_DELAY)
+
+
+def create_app():
+    app = Flask(__name__)
+
+    @app.route('/broken')
+    @endpoint.api()
+    def broken():
+        raise Exception('whoops')
+
+    return app
+
+
+def bench(client):
+    start = time.time()
+    for _ in range(REQUESTS):
+        client.get('/broken')
+    return (time.time() - start) / REQUESTS * 1000
+
+
+def main():
+    client = create_app().test_client()
+    root = logging.getLogger()
+    handler = SlowHandler()
+    root.addHandler(handler)
+
+    sync = bench(client)
+
+    # the slow root handler now runs on the listener thread
+    async_logging = enable_async_logging(queue_size=REQUESTS * 2)
+    _async = bench(client)
+    start = time.time()
+    async_logging.stop()
+    flush = time.time() - start
+
+    print("handler delay:      %.2f ms" % (HANDLER_DELAY * 1000))
+    print("sync logging:       %.2f ms/request" % sync)
+    print("async logging:      %.2f ms/request" % _async)
+    print("async flush:        %.2f s (%d dropped)" % (flush, async_logging.dropped))
+
+
+if __name__ == '__main__':
+    main()
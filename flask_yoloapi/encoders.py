@@ -0,0 +1,175 @@
+import sys
+import json
+from operator import attrgetter, itemgetter
+from json.encoder import encode_basestring_ascii
+
+from flask import json as flask_json
+
+from flask_yoloapi.types import RawJSON
+
+try:
+    import dataclasses
+except ImportError:  # python < 3.7
+    dataclasses = None
+
+_encoders = {}
+_registered = set()
+_MISSING = object()
+
+
+def _encode_float(value):
+    if value != value or value in (float('inf'), float('-inf')):
+        return json.dumps(value)
+    return float.__repr__(value)
+
+
+STRING_LIKE = (str,)
+LEAF_ENCODERS = {
+    str: encode_basestring_ascii,
+    int: int.__repr__,
+    float: _encode_float,
+    bool: lambda value: 'true' if value else 'false',
+    type(None): lambda value: 'null'
+}
+if sys.version_info < (3, 0):
+    STRING_LIKE = (unicode, str)
+    LEAF_ENCODERS[unicode] = encode_basestring_ascii
+    LEAF_ENCODERS[long] = long.__repr__
+
+
+def slot_names(cls):
+    """Returns the public slots of `cls`, or `None` when not every
+    class in its MRO defines `__slots__`. Slots starting with an
+    underscore are considered private"""
+    bases = cls.__mro__[:-1]
+    if not bases or not all('__slots__' in base.__dict__ for base in bases):
+        return
+
+    names = []
+    for base in reversed(bases):
+        slots = base.__dict__['__slots__']
+        if isinstance(slots, STRING_LIKE):
+            slots = (slots,)
+        names.extend(name for name in slots
+                     if not name.startswith('_') and name not in names)
+    return tuple(names)
+
+
+def register(cls):
+    """Opts-in a `__slots__` class for encoding, as a class decorator.
+    Unlike dataclasses and namedtuples, slotted classes are not encoded
+    automatically; many of them (e.g. `uuid.UUID`) are better left to
+    the app's JSON encoder"""
+    if slot_names(cls) is None:
+        raise TypeError("'%s' must define __slots__ in all of its bases" % cls.__name__)
+    _registered.add(cls)
+    _encoders.pop(cls, None)
+    return cls
+
+
+def fields(cls):
+    """Returns the field names of a dataclass, namedtuple or
+    registered `__slots__` class, otherwise `None`"""
+    if dataclasses is not None and dataclasses.is_dataclass(cls):
+        return tuple(field.name for field in dataclasses.fields(cls))
+    if issubclass(cls, tuple) and hasattr(cls, '_fields'):
+        return tuple(cls._fields)
+    if cls in _registered:
+        return slot_names(cls)
+
+
+def _build_encoder(cls, names):
+    if not names:
+        return lambda obj, encode: '{}'
+
+    keys = [encode_basestring_ascii(name) + ':' for name in names]
+    prefixes = ['{' + keys[0]] + [',' + key for key in keys[1:]]
+
+    if issubclass(cls, tuple):
+        values = iter
+    elif dataclasses is not None and dataclasses.is_dataclass(cls):
+        values = attrgetter(*names) if len(names) > 1 else lambda obj: (getattr(obj, names[0]),)
+    else:
+        # slots may be unset
+        values = lambda obj: [getattr(obj, name, None) for name in names]
+
+    def encode_object(obj, encode):
+        return ''.join([prefix + encode(value) for prefix, value
+                        in zip(prefixes, values(obj))]) + '}'
+    return encode_object
+
+
+def encoder_for(cls):
+    """Returns the (cached) encoder of `cls`, or `None`
+    when instances of `cls` are not encodable"""
+    encoder = _encoders.get(cls, _MISSING)
+    if encoder is _MISSING:
+        names = fields(cls)
+        encoder = _build_encoder(cls, names) if names is not None else None
+        _encoders[cls] = encoder
+    return encoder
+
+
+def encodable(value):
+    """Checks if `value` is, or contains, an object that is handled by
+    these encoders, or a `RawJSON` fragment. Such payloads are encoded
+    entirely by `encode`, so that objects get the same shape wherever
+    they are in the payload"""
+    cls = value.__class__
+    if cls in LEAF_ENCODERS:
+        return False
+    elif cls is list or cls is tuple:
+        for item in value:
+            if encodable(item):
+                return True
+        return False
+    elif cls is dict:
+        for item in value.values():
+            if encodable(item):
+                return True
+        return False
+    elif cls is RawJSON or encoder_for(cls) is not None:
+        return True
+    elif isinstance(value, (list, tuple)):
+        return encodable(list(value))
+    elif isinstance(value, dict):
+        return encodable(dict(value))
+    return False
+
+
+def _make_encode(sort_keys):
+    def encode(value):
+        cls = value.__class__
+        leaf = LEAF_ENCODERS.get(cls)
+        if leaf is not None:
+            return leaf(value)
+        elif cls is list or cls is tuple:
+            return '[' + ','.join([encode(item) for item in value]) + ']'
+        elif cls is RawJSON:
+            return value.data.decode('utf8')
+        elif cls is dict:
+            items = [(k if isinstance(k, STRING_LIKE) else json.dumps(k), v) for k, v in value.items()]
+            if sort_keys:
+                items.sort(key=itemgetter(0))
+            return '{' + ','.join([encode_basestring_ascii(k) + ':' + encode(v) for k, v in items]) + '}'
+
+        encoder = encoder_for(cls)
+        if encoder is not None:
+            return encoder(value, encode)
+        elif isinstance(value, (list, tuple)):
+            return encode(list(value))
+        elif isinstance(value, dict):
+            return encode(dict(value))
+        return flask_json.dumps(value)
+    return encode
+
+
+_encode = _make_encode(sort_keys=False)
+_encode_sorted = _make_encode(sort_keys=True)
+
+
+def encode(value, sort_keys=False):
+    """Encodes `value` to a JSON string in one pass. Values that are
+    not handled here fall back to the app's JSON encoder. Object fields
+    keep their declaration order; dict keys are sorted with `sort_keys`"""
+    return _encode_sorted(value) if sort_keys else _encode(value)
@@ -1,21 +1,27 @@
 import sys
+import json
 import inspect
 import logging
 from functools import wraps
 from datetime import datetime
 
 import dateutil.parser
-from flask import jsonify, Response
+from flask import jsonify, current_app, request, Response
 from werkzeug.exceptions import HTTPException
 from werkzeug.wrappers import Response as WResponse
 
-from flask_yoloapi import utils
-from flask_yoloapi.types import ANY
+from flask_yoloapi import utils, encoders
+from flask_yoloapi.types import ANY, RawJSON
+from flask_yoloapi.exceptions import ParameterError
+from flask_yoloapi.profiling import Profiler
+from flask_yoloapi.ratelimit import RateLimit
+from flask_yoloapi.idempotency import Idempotency
 
 logger = logging.getLogger(__name__)
 
 # Python 2 and 3 support
-SUPPORTED_TYPES = (bool, list, dict, datetime, type(None), ANY)
+NONE_TYPE = type(None)
+SUPPORTED_TYPES = (bool, list, dict, datetime, NONE_TYPE, ANY)
 if sys.version_info >= (3, 0):
     NUMERIC_TYPES = (int, float)
     STRING_LIKE = (str,)
@@ -28,8 +34,21 @@ SUPPORTED_TYPES += NUMERIC_TYPES
 
 
 @utils.decorator_parametrized
-def api(view_func, *parameters):
+def api(view_func, *parameters, **options):
     """YOLO!"""
+    profile = options.pop('profile', None)
+    rate_limit = options.pop('rate_limit', None)
+    idempotency = options.pop('idempotency', None)
+    if options:
+        raise TypeError("unexpected keyword argument(s) for api: %s" %
+                        ", ".join(sorted(options)))
+    if profile is not None and not isinstance(profile, Profiler):
+        raise TypeError("'profile' must be a 'flask_yoloapi.profiling.Profiler'")
+    if rate_limit is not None and not isinstance(rate_limit, RateLimit):
+        raise TypeError("'rate_limit' must be a 'flask_yoloapi.ratelimit.RateLimit'")
+    if idempotency is not None and not isinstance(idempotency, Idempotency):
+        raise TypeError("'idempotency' must be a 'flask_yoloapi.idempotency.Idempotency'")
+
     messages = {
         "required": "argument '%s' is required",
         "type_error": "wrong type for argument '%s', "
@@ -39,6 +58,10 @@ def api(view_func, *parameters):
                                "type annotations (PEP 484)",
         "datetime_parse_error": "datetime '%s' could not be parsed using "
                                 "dateutil.parser(\"%s\")",
+        "item_type_error": "wrong type for an item of argument '%s', "
+                           "should be of type '%s'",
+        "too_many_items": "argument '%s' has too many items, "
+                          "the maximum is %d",
         "bad_return": "view function returned unsupported type '%s'",
         "bad_return_tuple": "when returning tuples, the first index "
                             "must be an object of any supported "
@@ -46,31 +69,36 @@ def api(view_func, *parameters):
                             "HTTP return status code as an integer"
     }
 
+    # fall-back type annotations from function signatures
+    # when no parameter type is specified (python >3.5 only)
+    if sys.version_info >= (3, 5):
+        signature = inspect.signature(view_func)
+        for param in parameters:
+            annotation = signature.parameters.get(param.key)
+            if param.type is None and annotation is not None and \
+                    annotation.annotation is not inspect._empty:
+                param.type = annotation.annotation
+
+    # keys that collect all values of a repeated key
+    multi = [param.key for param in parameters if param.type is list]
+
     def func_err(message, http_status=500):
+        return jsonify(**error_envelope(message, http_status)), http_status
+
+    def error_envelope(message, http_status=500):
         if 500 <= http_status < 600:
             logger.exception(message)
         else:
             logger.error(message)
 
-        return jsonify(
-            data=message,
-            docstring=utils.docstring(view_func, *parameters)
-        ), http_status
-
-    @wraps(view_func)
-    def validate_and_execute(*args, **kwargs):
-        # grabs incoming data (multiple methods)
-        request_data = utils.get_request_data()
-
-        # fall-back type annotations from function signatures
-        # when no parameter type is specified (python >3.5 only)
-        type_annotations = None
-        if sys.version_info >= (3, 5):
-            signature = inspect.signature(view_func)
-            type_annotations = {k: v.annotation for k, v in
-                                signature.parameters.items()
-                                if v.annotation is not inspect._empty}
+        return {
+            "data": message,
+            "docstring": utils.docstring(view_func, *parameters)
+        }
 
+    def validate(request_data, kwargs):
+        """Validates and coerces incoming parameters into `kwargs`. Returns an
+        error message, or a `flask.Response` returned by a validator, on failure"""
         for param in parameters:
             # normalize param key for the view_func(*args, **kwargs) call
             param_key_safe = param.key.replace('-', '_')
@@ -78,7 +106,7 @@ def api(view_func, *parameters):
             # checks if param is required
             if param.key not in request_data[param.location]:
                 if param.required:
-                    return func_err(messages["required"] % param.key)
+                    return messages["required"] % param.key
                 else:
                     # set default value, if provided
                     if param.default is not None:
@@ -87,39 +115,44 @@ def api(view_func, *parameters):
                         kwargs[param_key_safe] = None
                     continue
 
-            # set the param type from function annotation (runs only once)
-            if type_annotations and param.type is None:
-                if param.key in type_annotations:
-                    param.type = type_annotations[param.key]
-                else:
-                    return func_err(messages["type_required_py3.5"] % param.key)
+            # no type argument nor type annotation
+            if param.type is None:
+                return messages["type_required_py3.5"] % param.key
 
             # validate the param value
             value = request_data[param.location].get(param.key)
-            if type(value) != param.type:
-                if param.type in NUMERIC_TYPES:
+            if param.type is list:
+                if isinstance(value, STRING_LIKE):
+                    value = [value]
+                elif not isinstance(value, list):
+                    return messages["type_error"] % (param.key, param.type)
+
+                items = []
+                for v in value:
+                    if not isinstance(v, STRING_LIKE):
+                        items.append(v)
+                    elif param.delimiter:
+                        items.extend(split_items(v, param.delimiter, param.max_items))
+                    elif v:
+                        items.append(v)
+                    if param.max_items is not None and len(items) > param.max_items:
+                        break
+                value = items
+                if param.max_items is not None and len(value) > param.max_items:
+                    return messages["too_many_items"] % (param.key, param.max_items)
+
+                if param.item_type is not None:
                     try:
-                        value = param.type(value)  # opportunistic coercing to int/float/long
+                        value = [coerce(item, param.item_type) for item in value]
                     except ValueError:
-                        return func_err(messages["type_error"] % (param.key, param.type))
-                elif param.type in STRING_LIKE:
-                    pass
-                elif param.type is ANY:
-                    pass
-                elif param.type is datetime:
-                    try:
-                        value = dateutil.parser.parse(value)
-                    except:
-                        return func_err(messages["datetime_parse_error"] % (param.key, str(value)))
-                elif param.type is bool and type(value) in STRING_LIKE:
-                    if value.lower() in ('true', 'y'):
-                        value = True
-                    elif value.lower() in ('false', 'n'):
-                        value = False
-                    else:
-                        return func_err(messages["type_error"] % (param.key, param.type))
-                else:
-                    return func_err(messages["type_error"] % (param.key, param.type))
+                        return messages["item_type_error"] % (param.key, param.item_type)
+            elif type(value) != param.type:
+                try:
+                    value = coerce(value, param.type)
+                except ValueError:
+                    if param.type is datetime:
+                        return messages["datetime_parse_error"] % (param.key, str(value))
+                    return messages["type_error"] % (param.key, param.type)
 
             # validate via custom validator, if provided
             if param.kwargs.get('validator', None):
@@ -132,10 +165,39 @@ def api(view_func, *parameters):
                                         "either return nothing, raise an Exception or "
                                         "return a `flask.Response` object.")
                 except Exception as ex:
-                    return func_err("parameter '%s' error: %s" % (param.key, str(ex)))
+                    return "parameter '%s' error: %s" % (param.key, str(ex))
 
             kwargs[param_key_safe] = value
 
+    @wraps(view_func)
+    def validate_and_execute(*args, **kwargs):
+        if rate_limit is not None:
+            rejected = rate_limit.check(request.endpoint)
+            if rejected is not None:
+                return rejected
+
+        if profile is not None and profile.should_profile():
+            return profile.run(request.endpoint, _validate_and_execute, *args, **kwargs)
+        return _validate_and_execute(*args, **kwargs)
+
+    def _validate_and_execute(*args, **kwargs):
+        # grabs incoming data (multiple methods)
+        request_data = utils.get_request_data(multi=multi)
+
+        error = validate(request_data, kwargs)
+        if isinstance(error, Response):
+            return error
+        elif error is not None:
+            return func_err(error)
+
+        if idempotency is not None:
+            key = idempotency.request_key()
+            if key is not None:
+                return idempotency.run(request.endpoint, key, kwargs,
+                                       lambda: execute(*args, **kwargs))
+        return execute(*args, **kwargs)
+
+    def execute(*args, **kwargs):
         try:
             result = view_func(*args, **kwargs)
         except HTTPException:
@@ -145,22 +207,147 @@ def api(view_func, *parameters):
 
         if isinstance(result, (Response, WResponse)):
             return result
-        elif result is None:
-            return jsonify(data=None), 204
-        elif isinstance(result, tuple):
-            if not len(result) == 2 or not isinstance(result[1], int):
-                return func_err(messages["bad_return_tuple"])
-            return jsonify(data=result[0]), result[1]
+        try:
+            data, status = unpack(result)
+        except ValueError as ex:
+            return func_err(str(ex))
+        return envelope(data), status
 
-        elif not isinstance(result, SUPPORTED_TYPES):
+    def unpack(result):
+        """Splits the result of the view function into `(data, status)`.
+        Raises `ValueError` for bad status tuples and `TypeError`
+        for unsupported return types"""
+        if result is None:
+            return None, 204
+        elif type(result) is tuple:  # namedtuples are objects, not statuses
+            if not len(result) == 2 or not isinstance(result[1], int):
+                raise ValueError(messages["bad_return_tuple"])
+            return result
+        elif not isinstance(result, SUPPORTED_TYPES + (RawJSON,)) and \
+                encoders.encoder_for(result.__class__) is None:
             raise TypeError("Bad return type for api_result")
+        return result, 200
+
+    def direct_call(args, kwargs, as_envelope=False):
+        # incoming data is the keyword arguments, for every location
+        data, view_kwargs = {}, dict(kwargs)
+        for param in parameters:
+            param_key_safe = param.key.replace('-', '_')
+            for key in (param.key, param_key_safe):
+                if key in view_kwargs:
+                    data[param.key] = view_kwargs.pop(key)
+                    break
+        request_data = {location: data for location in ('all', 'args', 'form', 'json')}
+
+        error = validate(request_data, view_kwargs)
+        if isinstance(error, Response):
+            return error
+        elif error is not None:
+            if as_envelope:
+                return error_envelope(error), 500
+            raise ParameterError(error)
+
+        if not as_envelope:
+            return view_func(*args, **view_kwargs)
 
-        return jsonify(data=result)
+        try:
+            result = view_func(*args, **view_kwargs)
+        except HTTPException:
+            raise
+        except Exception as ex:
+            return error_envelope(str(ex)), 500
+
+        if isinstance(result, (Response, WResponse)):
+            return result
+        try:
+            data, status = unpack(result)
+        except ValueError as ex:
+            return error_envelope(str(ex)), 500
+
+        # pre-encoded fragments and objects come back as they would over HTTP
+        if encoders.encodable(data):
+            data = json.loads(encoders.encode(data))
+        return {"data": data}, status
+
+    validate_and_execute.yoloapi_call = direct_call
     return validate_and_execute
 
 
+def call(view_func, *args, **kwargs):
+    """Calls an `api` view function directly, bypassing HTTP. Keyword arguments
+    go through the same coercion and validators as incoming parameters.
+    Returns the result of the view function, or raises a `ParameterError`
+    on invalid input. With `_envelope=True`, returns `({"data": ...}, status)`
+    instead, like the HTTP response would"""
+    as_envelope = kwargs.pop('_envelope', False)
+    direct_call = getattr(view_func, 'yoloapi_call', None)
+    if direct_call is None:
+        raise TypeError("'%s' is not an endpoint.api view function" %
+                        getattr(view_func, '__name__', view_func))
+    return direct_call(args, kwargs, as_envelope)
+
+
+def coerce(value, to_type):
+    """Opportunistically coerces an incoming value to `to_type`.
+    Raises `ValueError` when this is not possible"""
+    if type(value) == to_type:
+        return value
+    elif to_type in NUMERIC_TYPES:
+        try:
+            return to_type(value)
+        except (TypeError, ValueError):
+            raise ValueError("cannot coerce to '%s'" % to_type.__name__)
+    elif to_type in STRING_LIKE or to_type is ANY:
+        return value
+    elif to_type is datetime:
+        try:
+            return dateutil.parser.parse(value)
+        except Exception:
+            raise ValueError("cannot coerce to 'datetime'")
+    elif to_type is bool and type(value) in STRING_LIKE:
+        if value.lower() in ('true', 'y'):
+            return True
+        elif value.lower() in ('false', 'n'):
+            return False
+    raise ValueError("cannot coerce to '%s'" % to_type.__name__)
+
+
+def split_items(value, delimiter, limit=None):
+    """Splits `value` on `delimiter`, dropping empty items. Stops
+    once more than `limit` items are found, so that oversized
+    input is not split entirely"""
+    items, start = [], 0
+    while True:
+        end = value.find(delimiter, start)
+        item = value[start:] if end == -1 else value[start:end]
+        if item:
+            items.append(item)
+            if limit is not None and len(items) > limit:
+                break
+        if end == -1:
+            break
+        start = end + len(delimiter)
+    return items
+
+
+def envelope(data):
+    """Wraps `data` in the `{"data": ...}` JSON response. Pre-encoded
+    `RawJSON` fragments are spliced in as-is, skipping `jsonify`. So are
+    dataclasses, namedtuples and `__slots__` objects, after encoding"""
+    if not isinstance(data, RawJSON) and encoders.encodable(data):
+        data = RawJSON(encoders.encode(
+            data, sort_keys=current_app.config.get('JSON_SORT_KEYS', True)))
+    if isinstance(data, RawJSON):
+        return current_app.response_class(
+            b'{"data":' + data.data + b'}\n',
+            mimetype=current_app.config.get('JSONIFY_MIMETYPE', 'application/json')
+        )
+    return jsonify(data=data)
+
+
 class parameter:
-    def __init__(self, key, type=None, default=None, required=False, validator=None, location='all'):
+    def __init__(self, key, type=None, default=None, required=False, validator=None, location='all',
+                 item_type=None, delimiter=None, max_items=None):
         """
         Endpoint parameter
         :param key: The parameter name as a string
@@ -169,6 +356,9 @@ class parameter:
         :param required: Marks this parameter as 'required'
         :param validator: A custom function that further validates the parameter
         :param location: Location where to grab the parameter from. Can be any of: 'args', 'form', 'json'
+        :param item_type: For list parameters; the type each item is coerced to
+        :param delimiter: For list parameters; additionally split string values on this delimiter
+        :param max_items: For list parameters; the maximum amount of items
         """
         if not isinstance(key, STRING_LIKE):
             raise TypeError("bad type for 'key'; must be 'str'")
@@ -186,6 +376,17 @@ class parameter:
             raise TypeError("parameter 'validator' must be a function")
         if location and location not in ['all', 'args', 'form', 'json']:
             raise ValueError("unknown location '%s'" % location)
+        if item_type is not None or delimiter is not None or max_items is not None:
+            if type is None:
+                type = list
+            elif type is not list:
+                raise TypeError("'item_type', 'delimiter' and 'max_items' require a parameter of type 'list'")
+        if item_type is not None and (item_type not in SUPPORTED_TYPES or item_type in (list, dict, NONE_TYPE)):
+            raise TypeError("parameter item_type '%s' not supported" % str(item_type))
+        if delimiter is not None and (not isinstance(delimiter, STRING_LIKE) or not delimiter):
+            raise TypeError("bad type for 'delimiter'; must be a non-empty 'str'")
+        if max_items is not None and (not isinstance(max_items, int) or max_items < 1):
+            raise TypeError("bad type for 'max_items'; must be a positive 'int'")
 
         self.kwargs = {"validator": validator}
         self.default = default
@@ -194,3 +395,6 @@ class parameter:
         self.type = type
         self.type_annotations = None
         self.required = required
+        self.item_type = item_type
+        self.delimiter = delimiter
+        self.max_items = max_items
@@ -1,3 +1,8 @@
 class UnknownParameterType(BaseException):
     def __init__(self, *args, **kwargs):
         super(UnknownParameterType, self).__init__(*args, **kwargs)
+
+
+class ParameterError(Exception):
+    """Raised by `endpoint.call` when parameters fail validation"""
+    pass
@@ -0,0 +1,154 @@
+import json
+import time
+import hashlib
+import threading
+
+from flask import request, jsonify, make_response, current_app
+
+# marks a request that is still being executed
+PENDING = 'pending'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class MemoryStore(object):
+    """In-process response store. Other stores (e.g. redis, memcached)
+    must provide the same `get`, `add`, `set` and `delete` methods"""
+    def __init__(self, max_size=10000, sweep_interval=60):
+        """
+        :param max_size: Maximum amount of items; the oldest completed ones are evicted first
+        :param sweep_interval: Seconds between sweeps of expired items
+        """
+        self.max_size = max_size
+        self.sweep_interval = sweep_interval
+        self._data = {}
+        self._next_sweep = time.time() + sweep_interval
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def _sweep(self, now):
+        """Periodically removes expired items, and evicts the oldest item
+        when the store is full. Items of requests that are still in progress
+        are never evicted. Must be called with the lock held"""
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.sweep_interval
+            for key in [key for key, item in self._data.items() if item[1] < now]:
+                del self._data[key]
+
+        if len(self._data) >= self.max_size:
+            for key, item in self._data.items():
+                if item[0] != PENDING:
+                    del self._data[key]
+                    break
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return
+            if item[1] < time.time():
+                del self._data[key]
+                return
+            return item[0]
+
+    def add(self, key, value, ttl):
+        """Sets `key` only when it does not exist yet. Returns
+        `True` when the key was set"""
+        with self._lock:
+            now = time.time()
+            item = self._data.get(key)
+            if item is not None and item[1] >= now:
+                return False
+            self._sweep(now)
+            self._data[key] = (value, now + ttl)
+            return True
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            now = time.time()
+            if key not in self._data:
+                self._sweep(now)
+            self._data[key] = (value, now + ttl)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class Idempotency(object):
+    def __init__(self, store=None, ttl=86400, header='Idempotency-Key',
+                 lock_ttl=60, wait_timeout=30, poll_interval=0.05):
+        """
+        Replays stored responses of retried requests, handed to
+        `endpoint.api(idempotency=...)`. Only applies to non-GET requests
+        that carry the idempotency header.
+        :param store: Response store; defaults to a `MemoryStore`
+        :param ttl: Seconds a completed response is kept
+        :param header: Name of the header holding the idempotency key
+        :param lock_ttl: Seconds after which an unfinished request is considered lost
+        :param wait_timeout: Seconds a concurrent duplicate waits for the first request
+        :param poll_interval: Seconds between polls of the store while waiting
+        """
+        self.store = store if store is not None else MemoryStore()
+        for method in ('get', 'add', 'set', 'delete'):
+            if not callable(getattr(self.store, method, None)):
+                raise TypeError("idempotency store must implement '%s'" % method)
+
+        self.ttl = ttl
+        self.header = header
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+
+    def request_key(self):
+        if request.method in SAFE_METHODS:
+            return
+        return request.headers.get(self.header)
+
+    def store_key(self, name, key, kwargs):
+        params = json.dumps(kwargs, sort_keys=True, default=str)
+        digest = hashlib.sha256(params.encode('utf8')).hexdigest()
+        return "yoloapi:%s:%s:%s" % (name, key, digest)
+
+    def run(self, name, key, kwargs, execute):
+        """Returns the stored response for `key`, or runs `execute` and
+        stores its response. Concurrent duplicates wait for the first"""
+        if len(key) > 255:
+            return jsonify(data="idempotency key too long"), 400
+
+        store_key = self.store_key(name, key, kwargs)
+        while not self.store.add(store_key, PENDING, self.lock_ttl):
+            stored = self.wait(store_key)
+            if stored == PENDING:
+                return jsonify(data="a request with this idempotency key "
+                                    "is still in progress"), 409
+            elif stored is not None:
+                return self.replay(stored)
+            # the first request failed; take over
+
+        stored = None
+        try:
+            response = make_response(execute())
+            if response.status_code < 500 and not response.is_streamed:
+                stored = (response.status_code, list(response.headers.items()), response.get_data())
+            return response
+        finally:
+            if stored is not None:
+                self.store.set(store_key, stored, self.ttl)
+            else:
+                self.store.delete(store_key)
+
+    def wait(self, store_key):
+        deadline = time.time() + self.wait_timeout
+        stored = self.store.get(store_key)
+        while stored == PENDING and time.time() < deadline:
+            time.sleep(self.poll_interval)
+            stored = self.store.get(store_key)
+        return stored
+
+    def replay(self, stored):
+        status, headers, body = stored
+        response = current_app.response_class(body, status=status, headers=headers)
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response
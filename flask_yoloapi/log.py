@@ -0,0 +1,114 @@
+import atexit
+import logging
+import threading
+
+try:
+    import queue
+    from logging.handlers import QueueHandler, QueueListener
+except ImportError:  # python 2
+    QueueHandler = object
+    QueueListener = None
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Enqueues records without blocking the request thread. Records
+    are formatted lazily, by the handlers on the listener thread.
+    When the queue is full, records are dropped and counted"""
+    def __init__(self, queue):
+        super(NonBlockingQueueHandler, self).__init__(queue)
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def prepare(self, record):
+        # the default implementation formats the message (and traceback)
+        # on the calling thread; leave that to the listener
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+
+class PropagatingHandler(logging.Handler):
+    """Hands records to the handlers of `logger` and its ancestors, like
+    propagation would. Handlers are looked up per record, so handlers added
+    later (e.g. by `dictConfig`) are used too. Falls back to
+    `logging.lastResort` when there are no handlers at all"""
+    def __init__(self, logger):
+        super(PropagatingHandler, self).__init__()
+        self.logger = logger
+
+    def handle(self, record):
+        found = 0
+        logger = self.logger
+        while logger:
+            for handler in logger.handlers:
+                found += 1
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+            logger = logger.parent if logger.propagate else None
+
+        if not found and logging.lastResort and record.levelno >= logging.lastResort.level:
+            logging.lastResort.handle(record)
+        return True
+
+
+class AsyncLogging(object):
+    def __init__(self, handler, listener, logger, propagate):
+        self.handler = handler
+        self.listener = listener
+        self.logger = logger
+        self._propagate = propagate
+        self.stopped = False
+
+    @property
+    def dropped(self):
+        """Amount of records dropped because the queue was full"""
+        return self.handler.dropped
+
+    def stop(self):
+        """Flushes the queue and restores synchronous logging. Called
+        automatically at exit, so that queued records are not lost"""
+        if self.stopped:
+            return
+        self.stopped = True
+        atexit.unregister(self.stop)
+        self.listener.stop()
+        self.logger.removeHandler(self.handler)
+        self.logger.propagate = self._propagate
+
+
+def enable_async_logging(handlers=None, queue_size=10000, logger_name='flask_yoloapi'):
+    """
+    Moves logging of this library off the request thread. Records are put
+    on a bounded queue and handled by a background thread.
+    :param handlers: Handlers that do the actual (slow) work. Defaults to the
+    handlers of the parent loggers, which would otherwise receive the records
+    :param queue_size: Maximum amount of queued records, before records are dropped
+    :param logger_name: Name of the logger to make non-blocking
+    :return: An `AsyncLogging` object, holding the drop counter and `stop()`.
+    The queue is flushed at exit
+    """
+    if QueueListener is None:
+        raise RuntimeError("non-blocking logging requires python 3.2 or newer")
+    if not isinstance(queue_size, int) or queue_size < 1:
+        raise TypeError("bad type for 'queue_size'; must be a positive 'int'")
+
+    logger = logging.getLogger(logger_name)
+    if handlers is None:
+        handlers = [PropagatingHandler(logger.parent)]
+    elif not handlers:
+        raise ValueError("'handlers' must not be empty")
+
+    handler = NonBlockingQueueHandler(queue.Queue(queue_size))
+    listener = QueueListener(handler.queue, *handlers, respect_handler_level=True)
+
+    async_logging = AsyncLogging(handler, listener, logger, logger.propagate)
+    logger.addHandler(handler)
+    logger.propagate = False
+    listener.start()
+    atexit.register(async_logging.stop)
+    return async_logging
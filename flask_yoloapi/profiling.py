@@ -0,0 +1,198 @@
+import os
+import re
+import glob
+import hmac
+import time
+import atexit
+import random
+import pstats
+import marshal
+import logging
+import cProfile
+import threading
+
+from flask import request, jsonify
+
+logger = logging.getLogger(__name__)
+
+
+class Profiler(object):
+    def __init__(self, directory, sample_rate=0.0, header=None, header_value=None,
+                 profiler_factory=cProfile.Profile, flush_interval=10, max_age=3600):
+        """
+        Opt-in request profiler, handed to `endpoint.api(profile=...)`
+        :param directory: Directory where aggregated per-endpoint stats are written to
+        :param sample_rate: Fraction of requests to profile, between 0.0 and 1.0
+        :param header: Name of a trusted header that forces profiling of a request
+        :param header_value: Secret value the trusted header must carry
+        :param profiler_factory: Callable returning a fresh profiler. The profiler must
+        provide `enable()` and `disable()` and be loadable by `pstats.Stats`
+        :param flush_interval: Seconds between writes of the stats, by a background thread
+        :param max_age: Seconds after which the stats file of a process that stopped
+        writing (e.g. a dead worker or an earlier deploy) is removed
+        """
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("'sample_rate' must be between 0.0 and 1.0")
+        if header and not header_value:
+            raise ValueError("a trusted 'header' requires a 'header_value'")
+        if not callable(profiler_factory):
+            raise TypeError("'profiler_factory' must be callable")
+        if not isinstance(flush_interval, (int, float)) or flush_interval <= 0:
+            raise ValueError("'flush_interval' must be a positive number")
+        if not isinstance(max_age, (int, float)) or max_age <= flush_interval:
+            raise ValueError("'max_age' must be larger than 'flush_interval'")
+
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.header = header
+        self.header_value = header_value
+        self.profiler_factory = profiler_factory
+        self.flush_interval = flush_interval
+        self.max_age = max_age
+        self.stats = {}
+        self._dirty = set()
+        self._pid = None
+        self.token = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        atexit.register(self.flush)
+
+    def trusted(self):
+        """Checks if the current request carries the trusted header"""
+        if not self.header:
+            return False
+        value = request.headers.get(self.header)
+        return value is not None and hmac.compare_digest(
+            value.encode('utf8'), self.header_value.encode('utf8'))
+
+    def should_profile(self):
+        if self.trusted():
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def run(self, name, func, *args, **kwargs):
+        """Runs `func` under a fresh profiler and merges the
+        results into the stats of endpoint `name`"""
+        profiler = self.profiler_factory()
+        try:
+            profiler.enable()
+        except ValueError:
+            # another profiler is already active on this thread
+            return func(*args, **kwargs)
+
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
+            self.collect(name, profiler)
+
+    def collect(self, name, profiler):
+        with self._lock:
+            if self._pid != os.getpid():
+                # fresh (or forked) process; stats of the parent are its own
+                self._pid = os.getpid()
+                # pids get reused; the start time keeps the files apart
+                self.token = "%d-%d" % (self._pid, time.time())
+                self.stats, self._dirty = {}, set()
+                flusher = threading.Thread(target=self._flush_loop)
+                flusher.daemon = True
+                flusher.start()
+
+            if name in self.stats:
+                self.stats[name].add(profiler)
+            else:
+                self.stats[name] = pstats.Stats(profiler)
+            self._dirty.add(name)
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+                self.prune()
+            except Exception:
+                logger.exception("could not write profile stats to '%s'", self.directory)
+
+    def flush(self):
+        """Writes the stats of this process, one file per endpoint. Files
+        of endpoints without new stats are touched, to mark them as live"""
+        with self._flush_lock:
+            with self._lock:
+                if self._pid != os.getpid():
+                    return
+                dirty, self._dirty = self._dirty, set()
+                data = {name: marshal.dumps(self.stats[name].stats) for name in dirty}
+                names = list(self.stats)
+
+            for name in names:
+                path = self.path(name, self.token)
+                if name in data:
+                    with open(path + '.tmp', 'wb') as f:
+                        f.write(data[name])
+                    os.rename(path + '.tmp', path)
+                elif os.path.isfile(path):
+                    os.utime(path, None)
+
+    def prune(self):
+        """Removes stats files that were not written for `max_age` seconds"""
+        deadline = time.time() - self.max_age
+        for path in glob.glob(os.path.join(self.directory, '*.prof')):
+            try:
+                if os.path.getmtime(path) < deadline:
+                    os.remove(path)
+            except OSError:
+                pass  # removed by another process
+
+    def path(self, name, token):
+        return os.path.join(self.directory, "%s.pid%s.prof" % (re.sub(r'[^\w.-]', '_', name), token))
+
+    def paths(self, name):
+        """Returns the stats files of endpoint `name`, of all live processes"""
+        prefix = os.path.basename(self.path(name, ''))[:-len('.prof')]
+        pattern = re.compile(re.escape(prefix) + r'\d+-\d+\.prof$')
+        return [path for path in glob.glob(os.path.join(self.directory, '*.prof'))
+                if pattern.match(os.path.basename(path))]
+
+    def top(self, name, limit=25):
+        """Returns the `limit` most expensive functions of endpoint
+        `name`, merged over all processes, sorted by cumulative time"""
+        self.flush()
+        self.prune()
+        paths = self.paths(name)
+        if not paths:
+            return
+
+        stats = pstats.Stats(*paths)
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+        return [{
+            "function": "%s:%d(%s)" % func,
+            "ncalls": ncalls,
+            "tottime": tottime,
+            "cumtime": cumtime
+        } for func, (_, ncalls, tottime, cumtime, _) in rows[:limit]]
+
+    def init_app(self, app, rule='/_yoloapi/profile/<name>'):
+        """Registers a route that shows the top functions of an
+        endpoint. The route requires the trusted header"""
+        if not self.header:
+            raise ValueError("the profile route requires a trusted 'header'")
+
+        def yoloapi_profile(name):
+            if not self.trusted():
+                return jsonify(data="forbidden"), 403
+
+            try:
+                limit = int(request.args.get('limit', 25))
+            except ValueError:
+                return jsonify(data="wrong type for argument 'limit'"), 400
+
+            top = self.top(name, limit=limit)
+            if top is None:
+                return jsonify(data="no profile for endpoint '%s'" % name), 404
+            return jsonify(data=top)
+
+        app.add_url_rule(rule, 'yoloapi_profile', yoloapi_profile)
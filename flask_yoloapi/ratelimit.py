@@ -0,0 +1,129 @@
+import os
+import sys
+import mmap
+import time
+import struct
+import hashlib
+import threading
+
+from flask import request, jsonify
+
+if sys.version_info >= (3, 0):
+    STRING_LIKE = (str,)
+else:
+    STRING_LIKE = (unicode, str)
+
+try:
+    import fcntl
+except ImportError:  # Windows; the mapping is still shared, but updates are unlocked and may race
+    fcntl = None
+
+# slot layout: key fingerprint, tokens left, last refill timestamp
+SLOT = struct.Struct('<Qdd')
+
+
+class RateLimit(object):
+    def __init__(self, path, rate, burst=None, key='ip', slots=65536):
+        """
+        Token bucket rate limiter, handed to `endpoint.api(rate_limit=...)`.
+        The buckets live in a memory-mapped file, so that all worker
+        processes on a host enforce a single limit.
+        :param path: Path of the shared file. Use a separate file per application
+        :param rate: Amount of requests per second that is refilled
+        :param burst: Size of the bucket; defaults to `rate`
+        :param key: What to limit on. Either 'ip', 'header:<name>', 'param:<name>'
+        or a function that returns the key for the current request
+        :param slots: Amount of buckets in the shared file. Keys hashing
+        to the same slot evict each other
+        """
+        if not isinstance(rate, (int, float)) or rate <= 0:
+            raise TypeError("bad type for 'rate'; must be a positive number")
+        if burst is not None and (not isinstance(burst, (int, float)) or burst < 1):
+            raise TypeError("bad type for 'burst'; must be a number >= 1")
+        if not callable(key):
+            if not isinstance(key, STRING_LIKE):
+                raise TypeError("bad type for 'key'; must be 'str' or a function")
+            if key != 'ip' and not key.startswith(('header:', 'param:')):
+                raise ValueError("unknown rate limit key '%s'" % key)
+        if not isinstance(slots, int) or slots < 1:
+            raise TypeError("bad type for 'slots'; must be a positive 'int'")
+
+        self.rate = float(rate)
+        self.burst = float(burst or rate)
+        self.key = key
+        self.path = path
+        self.slots = slots
+        self._lock = threading.Lock()
+
+        # opened right away, so that a bad path fails at startup
+        self._open()
+
+    def _open(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = self.slots * SLOT.size
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        self._mmap = mmap.mmap(fd, size)
+        self._fd = fd
+
+    def request_key(self):
+        if callable(self.key):
+            return self.key()
+        elif self.key == 'ip':
+            return request.remote_addr
+        elif self.key.startswith('header:'):
+            return request.headers.get(self.key[7:])
+
+        name = self.key[6:]
+        value = request.args.get(name)
+        if value is None:
+            value = request.form.get(name)
+        if value is None:
+            json = request.get_json(silent=True)
+            if isinstance(json, dict):
+                value = json.get(name)
+        return value
+
+    def acquire(self, name, key):
+        """Takes a token from the bucket of (`name`, `key`). Returns
+        0 on success, otherwise the seconds until a token is available"""
+        digest = hashlib.sha1(("%s\0%s" % (name, key)).encode('utf8')).digest()
+        fingerprint = struct.unpack('<Q', digest[:8])[0]
+        offset = (fingerprint % self.slots) * SLOT.size
+
+        with self._lock:
+            if fcntl is not None:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX, SLOT.size, offset)
+            try:
+                now = time.time()
+                _fingerprint, tokens, timestamp = SLOT.unpack_from(self._mmap, offset)
+                if _fingerprint != fingerprint:
+                    tokens, timestamp = self.burst, now
+                else:
+                    tokens = min(self.burst, tokens + max(0.0, now - timestamp) * self.rate)
+
+                if tokens >= 1:
+                    SLOT.pack_into(self._mmap, offset, fingerprint, tokens - 1, now)
+                    return 0
+                SLOT.pack_into(self._mmap, offset, fingerprint, tokens, now)
+                return (1 - tokens) / self.rate
+            finally:
+                if fcntl is not None:
+                    fcntl.lockf(self._fd, fcntl.LOCK_UN, SLOT.size, offset)
+
+    def check(self, name):
+        """Returns a `429` response when the current request
+        exceeds the limit of endpoint `name`, otherwise `None`"""
+        key = self.request_key()
+        if key is None:
+            # clients can't dodge the limit by omitting the header or parameter
+            key = "remote_addr:%s" % request.remote_addr
+
+        retry_after = self.acquire(name, key)
+        if not retry_after:
+            return
+
+        response = jsonify(data="rate limit exceeded")
+        response.status_code = 429
+        response.headers['Retry-After'] = str(int(retry_after) + 1)
+        return response
@@ -5,3 +5,14 @@ class ANY(object):
 
     def __name__(self):
         return "ANY"
+
+
+class RawJSON(object):
+    """A pre-encoded JSON fragment. Returned from a view function, it is
+    spliced into the `{"data": ...}` envelope without being re-encoded"""
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        if not isinstance(data, bytes):
+            data = data.encode('utf8')
+        self.data = data
@@ -65,10 +65,11 @@ def docstring(view_func, *parameters):
     return data
 
 
-def get_request_data():
+def get_request_data(multi=()):
     """Very complicated and extensive algorithm
     to fetch incoming request data regardless
-    of the type of request"""
+    of the type of request. Keys in `multi` hold
+    all values of a repeated query string/form key"""
     locations = ['args', 'form', 'json']
     data = {k: {} for k in locations}
     data['all'] = {}
@@ -77,6 +78,8 @@ def get_request_data():
         _data = getattr(request, location)
         if _data:
             for k, v in _data.items():
+                if k in multi and location != 'json':
+                    v = _data.getlist(k)
                 data[location][k] = v
                 data['all'][k] = v
         else:
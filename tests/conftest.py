@@ -5,7 +5,7 @@ from tests.mock_app import create_app
 
 
 @pytest.fixture
-def app():
-    app = create_app()
+def app(tmpdir):
+    app = create_app(str(tmpdir))
     app.debug = True
     return app
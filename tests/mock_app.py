@@ -1,13 +1,21 @@
+import os
 import sys
+import time
+import uuid
+import tempfile
 from datetime import datetime
+from collections import namedtuple
 
-from flask import Flask, Response
+from flask import Flask, Blueprint, Response
 
-from flask_yoloapi.types import ANY
-from flask_yoloapi import endpoint, parameter
+from flask_yoloapi.types import ANY, RawJSON
+from flask_yoloapi import endpoint, parameter, encoders
+from flask_yoloapi.profiling import Profiler
+from flask_yoloapi.ratelimit import RateLimit
+from flask_yoloapi.idempotency import Idempotency
 
 
-def create_app():
+def create_app(directory):
     app = Flask(__name__)
 
     @app.route('/api/test_get')
@@ -148,6 +156,136 @@ def create_app():
     def api_test_types(a, b, c, d, e, f):
         return [a, b, c, d, e, f]
 
+    @app.route('/api/test_raw_json')
+    @endpoint.api(
+        parameter('status', type=int, required=False)
+    )
+    def api_test_raw_json(status):
+        if status:
+            return RawJSON('{"cached": true}'), status
+        return RawJSON(b'[1, 2, {"foo": "bar"}]')
+
+    @app.route('/api/test_list', methods=['GET', 'POST'])
+    @endpoint.api(
+        parameter('id', type=list, item_type=int, delimiter=',', max_items=4, required=True),
+        parameter('tag', type=list, required=False)
+    )
+    def api_test_list(id, tag):
+        return {'id': id, 'tag': tag}
+
+    rate_limit = RateLimit(os.path.join(directory, 'ratelimit.bin'),
+                           0.001, burst=2, key='header:X-Client')
+
+    @app.route('/api/test_rate_limit')
+    @endpoint.api(
+        parameter('name', type=str, required=True),
+        rate_limit=rate_limit
+    )
+    def api_test_rate_limit(name):
+        return name
+
+    app.config['IDEMPOTENCY_CALLS'] = []
+
+    @app.route('/api/test_idempotency', methods=['GET', 'POST'])
+    @endpoint.api(
+        parameter('amount', type=int, required=True),
+        idempotency=Idempotency(poll_interval=0.01)
+    )
+    def api_test_idempotency(amount):
+        app.config['IDEMPOTENCY_CALLS'].append(amount)
+        time.sleep(0.1)
+        if amount < 0:
+            raise Exception('negative amount')
+        return {'amount': amount, 'call': len(app.config['IDEMPOTENCY_CALLS'])}, 201
+
+    Point = namedtuple('Point', ['x', 'y'])
+
+    @encoders.register
+    class Slotted(object):
+        __slots__ = ('name', 'created', 'points', '_secret')
+
+        def __init__(self, name, points):
+            self.name = name
+            self.created = datetime(2018, 1, 1)
+            self.points = points
+            self._secret = 'hidden'
+
+    @app.route('/api/test_objects')
+    @endpoint.api(
+        parameter('many', type=bool, required=False)
+    )
+    def api_test_objects(many):
+        if many:
+            return [Slotted('a', [Point(1, 2)]), Slotted(u'\u00e9', [])]
+        return Point(1, {'z': [Point(3, 4.5)], 1: None}), 201
+
+    idempotency = Idempotency()
+    for name in ('users', 'orders'):
+        blueprint = Blueprint(name, __name__, url_prefix='/api/' + name)
+
+        @blueprint.route('/create', methods=['POST'])
+        @endpoint.api(
+            parameter('amount', type=int, required=True),
+            idempotency=idempotency
+        )
+        def create(amount, _name=name):
+            return {'created': _name, 'amount': amount}
+
+        app.register_blueprint(blueprint)
+
+    @app.route('/api/test_mixed')
+    @endpoint.api(
+        parameter('case', type=int, required=True)
+    )
+    def api_test_mixed(case):
+        return [
+            [Point(1, 2), 1],
+            [1, Point(1, 2)],
+            {'items': [Point(1, 2)]},
+            Point({'b': 1, 'a': 2}, None)
+        ][case]
+
+    @app.route('/api/test_uuid')
+    @endpoint.api()
+    def api_test_uuid():
+        return [uuid.UUID('12345678-1234-5678-1234-567812345678')]
+
+    @app.route('/api/test_nested_raw_json')
+    @endpoint.api()
+    def api_test_nested_raw_json():
+        return Point(RawJSON('{"cached": true}'), [RawJSON(b'1'), 2])
+
+    profiler = Profiler(os.path.join(directory, 'profiles'), header='X-Profile', header_value='secret')
+    profiler.init_app(app)
+    app.config['PROFILER'] = profiler
+
+    @app.route('/api/test_profile')
+    @endpoint.api(
+        parameter('name', type=str, required=True),
+        profile=profiler
+    )
+    def api_test_profile(name):
+        return name
+
+    if sys.version_info >= (3, 7):
+        from dataclasses import dataclass
+
+        @dataclass
+        class User:
+            name: str
+            age: int
+            point: Point = None
+
+        @app.route('/api/test_dataclass')
+        @endpoint.api()
+        def api_test_dataclass():
+            return [User('sander', 28, Point(0, 1)), User('dromer', 30)]
+
+        @app.route('/api/test_dataclass_nested')
+        @endpoint.api()
+        def api_test_dataclass_nested():
+            return {'users': [User('sander', 28, Point(0, 1))]}
+
     if sys.version_info >= (3, 5):
         @app.route('/api/test_type_annotations')
         @endpoint.api(
@@ -165,8 +303,15 @@ def create_app():
         def api_test_type_annotations_fail(name: str, age):
             return {"name": name, "age": age}
 
+        @app.route('/api/test_type_annotations_list')
+        @endpoint.api(
+            parameter('ids', required=True)
+        )
+        def api_test_type_annotations_list(ids: list):
+            return ids
+
     return app
 
 
 if __name__ == '__main__':
-    app = create_app()
\ No newline at end of file
+    app = create_app(tempfile.mkdtemp())
\ No newline at end of file
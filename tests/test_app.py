@@ -1,6 +1,9 @@
 # test_app.py
+import os
 import sys
 import json
+import shutil
+import threading
 import pytest
 from flask import url_for
 
@@ -206,6 +209,421 @@ class TestApp:
         assert res.content_type == mimetype
         assert res.json == {'data': ['test', 2, {'foo': 'bar'}, ['foo', 'bar'], 'Tue, 02 Jan 2018 00:00:00 GMT', False]}
 
+    def test_api_raw_json(self, client):
+        res = client.get(url_for("api_test_raw_json"))
+        assert res.content_type == mimetype
+        assert res.status_code == 200
+        assert res.json == {'data': [1, 2, {'foo': 'bar'}]}
+
+        res = client.get(url_for("api_test_raw_json"), query_string={'status': 201})
+        assert res.content_type == mimetype
+        assert res.status_code == 201
+        assert res.json == {'data': {'cached': True}}
+
+        client.application.config['JSONIFY_MIMETYPE'] = 'application/vnd.api+json'
+        res = client.get(url_for("api_test_raw_json"))
+        assert res.content_type == 'application/vnd.api+json'
+
+    def test_api_list(self, client):
+        res = client.get(url_for("api_test_list") + '?id=1&id=2&id=3&tag=a&tag=b')
+        assert res.content_type == mimetype
+        assert res.status_code == 200
+        assert res.json == {'data': {'id': [1, 2, 3], 'tag': ['a', 'b']}}
+
+        # comma separated, mixed with repeated keys
+        res = client.get(url_for("api_test_list") + '?id=1,2&id=3')
+        assert res.status_code == 200
+        assert res.json == {'data': {'id': [1, 2, 3], 'tag': None}}
+
+        res = client.post(url_for("api_test_list"), data=json.dumps({'id': ['1', 2]}), headers=headers)
+        assert res.status_code == 200
+        assert res.json == {'data': {'id': [1, 2], 'tag': None}}
+
+        # empty items are dropped
+        for query in ('?id=', '?id=1,2,', '?id=1&id=', '?id=,1,,2'):
+            res = client.get(url_for("api_test_list") + query)
+            assert res.status_code == 200
+            assert res.json['data']['id'] == [int(i) for i in query[4:].replace('&id=', ',').split(',') if i]
+
+        res = client.get(url_for("api_test_list") + '?id=' + ','.join(['1'] * 100000))
+        assert res.status_code == 500
+        assert 'argument \'id\' has too many items' in res.json.get('data')
+
+        res = client.get(url_for("api_test_list") + '?id=1,2,3,4,5')
+        assert res.status_code == 500
+        assert 'argument \'id\' has too many items' in res.json.get('data')
+
+        res = client.get(url_for("api_test_list") + '?id=1&id=error')
+        assert res.status_code == 500
+        assert 'wrong type for an item of argument \'id\'' in res.json.get('data')
+
+        res = client.post(url_for("api_test_list"), data=json.dumps({'id': {'foo': 1}}), headers=headers)
+        assert res.status_code == 500
+        assert 'wrong type for argument \'id\'' in res.json.get('data')
+
+    def test_api_rate_limit(self, client, tmpdir):
+        for _ in range(2):
+            res = client.get(url_for("api_test_rate_limit"), headers={'X-Client': 'a'})
+            assert res.status_code == 500
+
+        # rejected before validation
+        res = client.get(url_for("api_test_rate_limit"), headers={'X-Client': 'a'})
+        assert res.content_type == mimetype
+        assert res.status_code == 429
+        assert res.json == {'data': 'rate limit exceeded'}
+        assert int(res.headers['Retry-After']) > 0
+
+        # separate bucket per key
+        res = client.get(url_for("api_test_rate_limit"), query_string={'name': 'test'},
+                         headers={'X-Client': 'b'})
+        assert res.status_code == 200
+        assert res.json == {'data': 'test'}
+
+        # requests without a key are limited on the client address
+        for _ in range(2):
+            res = client.get(url_for("api_test_rate_limit"), query_string={'name': 'test'})
+            assert res.status_code == 200
+        res = client.get(url_for("api_test_rate_limit"), query_string={'name': 'test'})
+        assert res.status_code == 429
+
+        from flask_yoloapi.ratelimit import RateLimit
+        path = str(tmpdir.join('ratelimit.bin'))
+        with pytest.raises(TypeError):
+            RateLimit(path, 1, key=1)
+        with pytest.raises(ValueError):
+            RateLimit(path, 1, key='cookie:session')
+
+    def test_api_idempotency(self, client):
+        calls = client.application.config['IDEMPOTENCY_CALLS']
+        _headers = dict(headers, **{'Idempotency-Key': 'abc'})
+
+        res = client.post(url_for("api_test_idempotency"), data=json.dumps({'amount': 10}), headers=_headers)
+        assert res.status_code == 201
+        assert res.json == {'data': {'amount': 10, 'call': 1}}
+        assert 'Idempotent-Replayed' not in res.headers
+
+        # retry gets replayed
+        res = client.post(url_for("api_test_idempotency"), data=json.dumps({'amount': 10}), headers=_headers)
+        assert res.status_code == 201
+        assert res.json == {'data': {'amount': 10, 'call': 1}}
+        assert res.headers['Idempotent-Replayed'] == 'true'
+        assert calls == [10]
+
+        # different parameters, or no key at all, get executed
+        res = client.post(url_for("api_test_idempotency"), data=json.dumps({'amount': 20}), headers=_headers)
+        assert res.json == {'data': {'amount': 20, 'call': 2}}
+        res = client.post(url_for("api_test_idempotency"), data=json.dumps({'amount': 10}), headers=headers)
+        assert res.json == {'data': {'amount': 10, 'call': 3}}
+
+        # GET requests are not stored
+        for _ in range(2):
+            res = client.get(url_for("api_test_idempotency"), query_string={'amount': 30},
+                             headers={'Idempotency-Key': 'abc'})
+            assert res.status_code == 201
+        assert calls == [10, 20, 10, 30, 30]
+
+        # failed requests are not stored
+        for _ in range(2):
+            res = client.post(url_for("api_test_idempotency"), data=json.dumps({'amount': -1}), headers=_headers)
+            assert res.status_code == 500
+        assert calls == [10, 20, 10, 30, 30, -1, -1]
+
+    def test_api_idempotency_blueprints(self, client):
+        # same view name, key and parameters in different blueprints
+        _headers = dict(headers, **{'Idempotency-Key': 'abc'})
+        for name in ('users', 'orders'):
+            res = client.post(url_for(name + ".create"), data=json.dumps({'amount': 1}), headers=_headers)
+            assert res.json == {'data': {'created': name, 'amount': 1}}
+            assert 'Idempotent-Replayed' not in res.headers
+
+    def test_idempotency_memory_store(self):
+        from flask_yoloapi.idempotency import MemoryStore, PENDING
+
+        # expired items are swept
+        store = MemoryStore(sweep_interval=0)
+        for i in range(1000):
+            assert store.add(i, 'value', -1)
+        assert len(store) == 1
+
+        # full stores evict the oldest items
+        store = MemoryStore(max_size=10)
+        for i in range(20):
+            store.set(i, 'value', 60)
+        assert len(store) == 10
+        assert store.get(9) is None
+        assert store.get(19) == 'value'
+
+        # pending requests are not evicted
+        store = MemoryStore(max_size=3)
+        store.add('first', PENDING, 60)
+        for i in range(5):
+            store.set(i, 'value', 60)
+        assert len(store) == 3
+        assert store.get('first') == PENDING
+
+    def test_api_idempotency_concurrent(self, client):
+        calls = client.application.config['IDEMPOTENCY_CALLS']
+        _headers = dict(headers, **{'Idempotency-Key': 'concurrent'})
+        url = url_for("api_test_idempotency")
+        results = []
+
+        def post():
+            with client.application.test_client() as _client:
+                res = _client.post(url, data=json.dumps({'amount': 5}), headers=_headers)
+                results.append((res.status_code, res.json))
+
+        threads = [threading.Thread(target=post) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert calls == [5]
+        assert results == [(201, {'data': {'amount': 5, 'call': 1}})] * 3
+
+    def test_api_async_logging(self, client):
+        import logging
+        from flask_yoloapi.log import enable_async_logging
+
+        class ListHandler(logging.Handler):
+            def __init__(self):
+                super(ListHandler, self).__init__()
+                self.messages = []
+
+            def emit(self, record):
+                self.messages.append((record.levelname, self.format(record)))
+
+        handler = ListHandler()
+        async_logging = enable_async_logging(handlers=[handler], queue_size=10)
+        try:
+            res = client.get(url_for("api_test_broken_route"))
+            assert res.status_code == 500
+        finally:
+            async_logging.stop()
+
+        assert len(handler.messages) == 1
+        level, message = handler.messages[0]
+        assert level == 'ERROR'
+        assert message.startswith('whoops')
+        assert 'Traceback' in message
+        assert async_logging.dropped == 0
+        assert logging.getLogger('flask_yoloapi').propagate
+
+        # full queue drops records instead of blocking
+        async_logging = enable_async_logging(handlers=[handler], queue_size=1)
+        async_logging.listener.stop()
+        try:
+            for _ in range(3):
+                client.get(url_for("api_test_broken_route"))
+        finally:
+            async_logging.listener.start()
+            async_logging.stop()
+        assert async_logging.dropped == 2
+
+        # by default, records reach the handlers of the parent loggers,
+        # including handlers that were added later on
+        root = logging.getLogger()
+        async_logging = enable_async_logging()
+        handler = ListHandler()
+        root.addHandler(handler)
+        try:
+            client.get(url_for("api_test_broken_route"))
+        finally:
+            async_logging.stop()
+            root.removeHandler(handler)
+        assert len(handler.messages) == 1
+        assert handler.messages[0][1].startswith('whoops')
+
+    def test_api_async_logging_last_resort(self, client, capsys):
+        import logging
+        from flask_yoloapi.log import enable_async_logging
+
+        # without any handlers, records end up at `logging.lastResort`
+        root = logging.getLogger()
+        root_handlers, root.handlers = root.handlers, []
+        async_logging = enable_async_logging()
+        try:
+            client.get(url_for("api_test_broken_route"))
+        finally:
+            async_logging.stop()
+            root.handlers = root_handlers
+        assert 'whoops' in capsys.readouterr().err
+
+    def test_api_objects(self, client):
+        res = client.get(url_for("api_test_objects"))
+        assert res.content_type == mimetype
+        assert res.status_code == 201
+        assert res.json == {'data': {'x': 1, 'y': {'z': [{'x': 3, 'y': 4.5}], '1': None}}}
+
+        res = client.get(url_for("api_test_objects"), query_string={'many': 'y'})
+        assert res.status_code == 200
+        assert res.json == {'data': [
+            {'name': 'a', 'created': 'Mon, 01 Jan 2018 00:00:00 GMT', 'points': [{'x': 1, 'y': 2}]},
+            {'name': u'\u00e9', 'created': 'Mon, 01 Jan 2018 00:00:00 GMT', 'points': []}
+        ]}
+
+    def test_api_mixed(self, client):
+        # objects get the same shape wherever they are in the payload
+        point = {'x': 1, 'y': 2}
+        expected = [[point, 1], [1, point], {'items': [point]}]
+        for case, data in enumerate(expected):
+            res = client.get(url_for("api_test_mixed"), query_string={'case': case})
+            assert res.status_code == 200
+            assert res.json == {'data': data}
+
+        # dict keys are sorted like jsonify does, object fields keep their order
+        res = client.get(url_for("api_test_mixed"), query_string={'case': 3})
+        assert res.data.startswith(b'{"data":{"x":{"a":2,"b":1},"y":null}}')
+
+        client.application.config['JSON_SORT_KEYS'] = False
+        res = client.get(url_for("api_test_mixed"), query_string={'case': 3})
+        assert res.data.startswith(b'{"data":{"x":{"b":1,"a":2},"y":null}}')
+
+    def test_api_uuid(self, client):
+        # slotted stdlib types are left to the app's JSON encoder
+        res = client.get(url_for("api_test_uuid"))
+        assert res.content_type == mimetype
+        assert res.status_code == 200
+        assert res.json == {'data': ['12345678-1234-5678-1234-567812345678']}
+
+    def test_api_nested_raw_json(self, client):
+        res = client.get(url_for("api_test_nested_raw_json"))
+        assert res.status_code == 200
+        assert res.json == {'data': {'x': {'cached': True}, 'y': [1, 2]}}
+
+    def test_encoders_register(self):
+        from flask_yoloapi import encoders
+
+        class NotSlotted(object):
+            pass
+
+        with pytest.raises(TypeError):
+            encoders.register(NotSlotted)
+
+    def test_api_dataclass(self, client):
+        if not sys.version_info >= (3, 7):  # python >= 3.7 only
+            return
+
+        res = client.get(url_for("api_test_dataclass"))
+        assert res.content_type == mimetype
+        assert res.status_code == 200
+        assert res.json == {'data': [
+            {'name': 'sander', 'age': 28, 'point': {'x': 0, 'y': 1}},
+            {'name': 'dromer', 'age': 30, 'point': None}
+        ]}
+
+        res = client.get(url_for("api_test_dataclass_nested"))
+        assert res.status_code == 200
+        assert res.json == {'data': {'users': [{'name': 'sander', 'age': 28, 'point': {'x': 0, 'y': 1}}]}}
+
+    def test_api_call(self, client):
+        from flask_yoloapi import endpoint
+        from flask_yoloapi.exceptions import ParameterError
+        views = client.application.view_functions
+
+        assert endpoint.call(views["api_test_get_coerce"], name='test', age='28') == ['test', 28]
+        assert endpoint.call(views["api_test_get_default"]) == 'default'
+        assert endpoint.call(views["api_test_list"], id='1,2') == {'id': [1, 2], 'tag': None}
+        assert endpoint.call(views["api_test_status_code"]) == ("203 test", 203)
+
+        try:
+            endpoint.call(views["api_test_get_coerce"], name='test', age='error')
+            assert False
+        except ParameterError as ex:
+            assert 'wrong type for argument \'age\'' in str(ex)
+
+        try:
+            endpoint.call(views["api_test_age_validator"], age=150)
+            assert False
+        except ParameterError as ex:
+            assert "you can't possibly be that old!" in str(ex)
+
+        # custom Flask.Response returns from within the validator
+        res = endpoint.call(views["api_test_age_validator"], age=120)
+        assert res.status_code == 403
+
+        # envelopes
+        assert endpoint.call(views["api_test_get_coerce"], name='test', age=28, _envelope=True) == \
+            ({'data': ['test', 28]}, 200)
+        assert endpoint.call(views["api_test_status_code"], _envelope=True) == ({'data': '203 test'}, 203)
+        assert endpoint.call(views["api_test_empty_return"], _envelope=True) == ({'data': None}, 204)
+        assert endpoint.call(views["api_test_broken_route"], _envelope=True) == \
+            ({'data': 'whoops', 'docstring': None}, 500)
+        data, status = endpoint.call(views["api_test_get"], _envelope=True)
+        assert status == 500
+        assert 'argument \'name\' is required' in data['data']
+
+        # same return types and encoding as over HTTP
+        with pytest.raises(TypeError):
+            endpoint.call(views["api_test_unknown_return"], _envelope=True)
+        assert endpoint.call(views["api_test_raw_json"], _envelope=True) == \
+            ({'data': [1, 2, {'foo': 'bar'}]}, 200)
+        assert endpoint.call(views["api_test_raw_json"], status=202, _envelope=True) == \
+            ({'data': {'cached': True}}, 202)
+        assert endpoint.call(views["api_test_objects"], _envelope=True) == \
+            ({'data': {'x': 1, 'y': {'z': [{'x': 3, 'y': 4.5}], '1': None}}}, 201)
+
+        try:
+            endpoint.call(lambda: None)
+            assert False
+        except TypeError as ex:
+            assert 'is not an endpoint.api view function' in str(ex)
+
+    def test_api_profile(self, client):
+        # no sampling and no trusted header; nothing gets profiled
+        res = client.get(url_for("api_test_profile"), query_string={'name': 'test'})
+        assert res.status_code == 200
+        assert res.json == {'data': 'test'}
+
+        res = client.get(url_for("yoloapi_profile", name="api_test_profile"),
+                         headers={'X-Profile': 'secret'})
+        assert res.status_code == 404
+
+        # wrong header value
+        res = client.get(url_for("api_test_profile"), query_string={'name': 'test'},
+                         headers={'X-Profile': 'wrong'})
+        assert res.status_code == 200
+        res = client.get(url_for("yoloapi_profile", name="api_test_profile"),
+                         headers={'X-Profile': 'wrong'})
+        assert res.status_code == 403
+
+        for _ in range(2):
+            res = client.get(url_for("api_test_profile"), query_string={'name': 'test'},
+                             headers={'X-Profile': 'secret'})
+            assert res.status_code == 200
+            assert res.json == {'data': 'test'}
+
+        res = client.get(url_for("yoloapi_profile", name="api_test_profile"),
+                         query_string={'limit': 5}, headers={'X-Profile': 'secret'})
+        assert res.status_code == 200
+        assert 0 < len(res.json['data']) <= 5
+        row = next(row for row in res.json['data'] if '_validate_and_execute' in row['function'])
+        assert row['ncalls'] == 2
+
+        # stats of other worker processes are merged in
+        profiler = client.application.config['PROFILER']
+        shutil.copy(profiler.path('api_test_profile', profiler.token), profiler.path('api_test_profile', '1-1'))
+        res = client.get(url_for("yoloapi_profile", name="api_test_profile"),
+                         headers={'X-Profile': 'secret'})
+        row = next(row for row in res.json['data'] if '_validate_and_execute' in row['function'])
+        assert row['ncalls'] == 4
+
+        # ...but not those of processes that stopped writing
+        stale = profiler.path('api_test_profile', '1-1')
+        os.utime(stale, (0, 0))
+        res = client.get(url_for("yoloapi_profile", name="api_test_profile"),
+                         headers={'X-Profile': 'secret'})
+        row = next(row for row in res.json['data'] if '_validate_and_execute' in row['function'])
+        assert row['ncalls'] == 2
+        assert not os.path.exists(stale)
+
+        # the route can't be exposed without a trusted header
+        from flask_yoloapi.profiling import Profiler
+        with pytest.raises(ValueError):
+            Profiler(profiler.directory).init_app(client.application)
+        with pytest.raises(ValueError):
+            Profiler(profiler.directory, flush_interval=0)
+
     def test_api_type_annotations(self, client):
         if not sys.version_info >= (3, 5):  # python >= 3.5 only
             return
@@ -222,6 +640,11 @@ class TestApp:
         assert res.status_code == 500
         assert 'no type specified for parameter \'age\'' in res.json.get('data')
 
+        # list annotations collect repeated keys, starting with the first request
+        res = client.get(url_for("api_test_type_annotations_list") + '?ids=1&ids=2')
+        assert res.status_code == 200
+        assert res.json == {'data': ['1', '2']}
+
     def test_yolo_decorator(self, client):
         from flask_yoloapi import endpoint, parameter
         exceptions = 0
@@ -308,4 +731,17 @@ class TestApp:
             assert isinstance(ex, TypeError)
             assert 'not supported' in str(ex)
 
-        assert exceptions == 6
\ No newline at end of file
+        assert exceptions == 6
+
+        try:
+            @client.application.route('/bad_parameter_item_type')
+            @endpoint.api(
+                parameter('foo', type=str, item_type=int)
+            )
+            def bad_parameter_item_type(foo):
+                pass
+        except TypeError as ex:
+            exceptions += 1
+            assert 'require a parameter of type \'list\'' in str(ex)
+
+        assert exceptions == 7